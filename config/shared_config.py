@@ -1,5 +1,5 @@
 """
-This module provides the template for OpenVPN client configurations.
+This module provides the templates for OpenVPN client configurations.
 """
 
 CLIENT_TEMPLATE = """
@@ -36,3 +36,23 @@ USER_CERTS_TEMPLATE = """
 {user_key}
 </key>
 """
+
+SHARED_CLIENT_TEMPLATE = """client
+dev tun
+proto {proto}
+remote {server_ip} {port}
+resolv-retry infinite
+nobind
+persist-key
+persist-tun
+auth-user-pass
+remote-cert-tls server
+verb 3
+cipher {cipher}
+auth SHA256
+tls-version-min 1.2
+<ca>
+{ca_cert}
+</ca>{user_specific_certs}<tls-crypt>
+{tls_crypt_key}
+</tls-crypt>"""
@@ -1,12 +1,23 @@
 import os
+import pwd
+import secrets
 import subprocess
+import time
 import shutil
+import grp
+import ipaddress
 import json
 import logging
-from contextlib import contextmanager
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Sequence, Set, Tuple
 from .backup_interface import IBackupable
-from config.shared_config import CLIENT_TEMPLATE, USER_CERTS_TEMPLATE
+from config.shared_config import (
+    CLIENT_TEMPLATE,
+    SHARED_CLIENT_TEMPLATE,
+    USER_CERTS_TEMPLATE,
+)
 from config.config import VPNConfig, config, InstallSettings
 from config.constants import OpenVPNConstants, ConfigurablePaths
 from config.paths import VPNPaths
@@ -18,6 +29,11 @@ from core.exceptions import (
     ConfigurationError,
 )
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 LOG_LEVEL = os.environ.get("OPENVPN_MANAGER_LOG_LEVEL", "INFO").upper()
 LOG_FORMAT = os.environ.get(
     "OPENVPN_MANAGER_LOG_FORMAT",
@@ -26,16 +42,48 @@ LOG_FORMAT = os.environ.get(
 logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO), format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+# Parsed settings files shared by all manager instances in this process,
+# keyed by path and validated against (st_mtime_ns, st_size).
+_SETTINGS_CACHE: Dict[str, Tuple[Tuple[int, int], bytes, Dict[str, Any]]] = {}
+# Install-time files (CA certificate, tls-crypt key) keyed by path and
+# validated against st_mtime_ns.
+_FILE_CACHE: Dict[str, Tuple[int, str]] = {}
+
 
-@contextmanager
-def working_directory(path: str):
-    """Temporarily change the working directory within a context."""
-    prev_cwd = os.getcwd()
-    os.chdir(path)
+def _silent_run(cmd: List[str], **kwargs: Any) -> subprocess.CompletedProcess:
+    """Runs a command whose output is unused, keeping only stderr for error reports."""
+    return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **kwargs)
+
+
+def _unlink_quietly(path: str) -> None:
+    """Removes a leftover temporary file, ignoring one that is already gone."""
     try:
-        yield
-    finally:
-        os.chdir(prev_cwd)
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _atomic_write_bytes(path: str, data: bytes, mode: int = 0o644) -> None:
+    """Writes data to a temporary sibling file, fsyncs it and renames it into place."""
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, mode)
+    try:
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _unlink_quietly(tmp_path)
+        raise
+
+
+@lru_cache(maxsize=None)
+def _compose_client_template(template: str) -> str:
+    """Inlines the user cert/key section into a client template so it renders in one pass."""
+    return template.replace("{user_specific_certs}", USER_CERTS_TEMPLATE)
 
 
 class OpenVPNManager(IBackupable):
@@ -48,34 +96,232 @@ class OpenVPNManager(IBackupable):
     OPENVPN_DIR = config.OPENVPN_DIR
     SERVER_CONFIG_DIR = config.SERVER_CONFIG_DIR
     EASYRSA_DIR = config.EASYRSA_DIR
+    EASYRSA_SOURCE_DIR = "/usr/share/easy-rsa"
+    EC_CURVE = "prime256v1"
     PKI_DIR = config.PKI_DIR
     FIREWALL_RULES_V4 = config.FIREWALL_RULES_V4
     SETTINGS_FILE = config.SETTINGS_FILE
+    UNBOUND_CONFIG = "/etc/unbound/unbound.conf.d/openvpn.conf"
+    SYSCTL_CONFIG = "/etc/sysctl.d/99-openvpn.conf"
+
+    _NAT_SUBNETS = (
+        ("certificate-based", config.CERT_SUBNET),
+        ("login-based", config.LOGIN_SUBNET),
+    )
+    _PROC_ROUTE = "/proc/net/route"
+    _RTF_UP = 0x1
+    _PROC_IP_FORWARD = "/proc/sys/net/ipv4/ip_forward"
+    _APT_UPDATE_STAMPS = (
+        "/var/lib/apt/periodic/update-success-stamp",
+        "/var/lib/apt/lists",
+    )
+    _APT_MAX_AGE = 3600
+    _CRL_TARGET_DIRS = ("/etc/openvpn", "/etc/openvpn/server")
+    _SERVER_KEY_FILES = ("/etc/openvpn/ca.crt", "/etc/openvpn/tls-crypt.key")
+    # Runs the whole Easy-RSA bootstrap in one shell: $1 is the CA common name,
+    # $2 the server certificate name.
+    _PKI_SCRIPT = """\
+./easyrsa init-pki
+EASYRSA_CA_EXPIRE=3650 ./easyrsa --batch --req-cn="$1" build-ca nopass
+EASYRSA_CERT_EXPIRE=3650 ./easyrsa --batch build-server-full "$2" nopass
+EASYRSA_CRL_DAYS=3650 ./easyrsa gen-crl
+"""
+    _VPN_SERVICES = ("openvpn-server@server-cert", "openvpn-server@server-login")
+    _NAT_RULE_TEMPLATE = ("-s", "{subnet}", "-o", "{nic}", "-j", "MASQUERADE")
+    # Option "2" (local Unbound) depends on the subnet gateway; see _dns_lines.
+    _DNS_STATIC_OPTIONS = MappingProxyType(
+        {
+            "1": "",
+            "3": 'push "dhcp-option DNS 1.1.1.1"\npush "dhcp-option DNS 1.0.0.1"',
+            "4": 'push "dhcp-option DNS 8.8.8.8"\npush "dhcp-option DNS 8.8.4.4"',
+            "5": 'push "dhcp-option DNS 94.140.14.14"\npush "dhcp-option DNS 94.140.15.15"',
+        }
+    )
+    _TLS_CIPHERS = (
+        "TLS-ECDHE-RSA-WITH-AES-256-GCM-SHA384:"
+        "TLS-ECDHE-RSA-WITH-CHACHA20-POLY1305-SHA256:"
+        "TLS-ECDHE-RSA-WITH-AES-128-GCM-SHA256:"
+        "TLS-ECDHE-RSA-WITH-AES-256-CBC-SHA384"
+    )
+    _BASE_TEMPLATE = """port {port}
+proto {proto}
+dev tun
+topology subnet
+ca ca.crt
+cert server-cert.crt
+key server-cert.key
+dh none
+ecdh-curve {ec_curve}
+crl-verify crl.pem
+tls-crypt tls-crypt.key
+server 10.8.0.0 255.255.255.0
+ifconfig-pool-persist {run_dir}/ipp.txt
+status /var/log/openvpn/openvpn-status.log
+push "redirect-gateway def1 bypass-dhcp"
+{dns}
+keepalive 10 120
+cipher {cipher}
+ncp-ciphers {cipher}:AES-128-GCM
+ignore-unknown-option data-ciphers data-ciphers-fallback
+data-ciphers {cipher}:AES-128-GCM
+data-ciphers-fallback {cipher}
+auth SHA256
+tls-server
+tls-version-min 1.2
+tls-cipher {tls_ciphers}
+user nobody
+group nogroup
+persist-key
+persist-tun
+verb 3
+{extra_auth}"""
+    _LOGIN_TEMPLATE = """port {port}
+proto {proto}
+dev tun1
+topology subnet
+ca ca.crt
+cert server-cert.crt
+key server-cert.key
+dh none
+ecdh-curve {ec_curve}
+server 10.9.0.0 255.255.255.0
+ifconfig-pool-persist {run_dir}/ipp-login.txt
+
+# PAM authentication
+plugin /usr/lib/x86_64-linux-gnu/openvpn/plugins/openvpn-plugin-auth-pam.so openvpn
+username-as-common-name
+verify-client-cert none
+
+push "redirect-gateway def1 bypass-dhcp"
+{dns}
+keepalive 10 120
+
+# CRL verification
+crl-verify crl.pem
+tls-crypt tls-crypt.key
+cipher {cipher}
+ncp-ciphers {cipher}:AES-128-GCM
+ignore-unknown-option data-ciphers data-ciphers-fallback
+data-ciphers {cipher}:AES-128-GCM
+data-ciphers-fallback {cipher}
+auth SHA256
+tls-server
+tls-version-min 1.2
+tls-cipher {tls_ciphers}
+client-config-dir {ccd_dir}
+user nobody
+group nogroup
+persist-key
+persist-tun
+status /var/log/openvpn/status-login.log
+verb 3"""
+    _MONITORING_TEMPLATE = """
+# --- Traffic Monitoring Config ---
+script-security 2
+client-connect {on_connect}
+client-disconnect {on_disconnect}
+management {uds_socket} unix
+"""
+    _UNBOUND_TEMPLATE = """server:
+{subnet_lines}
+    ip-freebind: yes
+    hide-identity: yes
+    hide-version: yes
+    num-threads: {threads}
+    so-reuseport: yes
+    msg-cache-size: {msg_cache}
+    rrset-cache-size: {rrset_cache}
+    msg-cache-slabs: {slabs}
+    rrset-cache-slabs: {slabs}
+    infra-cache-slabs: {slabs}
+    key-cache-slabs: {slabs}
+    cache-min-ttl: 60
+    cache-max-ttl: 86400
+    prefetch: yes
+    prefetch-key: yes
+    serve-expired: yes
+    serve-expired-ttl: 86400
+    aggressive-nsec: yes
+    minimal-responses: yes
+    qname-minimisation: yes
+"""
 
     def __init__(self) -> None:
-        self.settings: Dict[str, Any] = {}
-        self._load_settings()
+        self._settings: Optional[Dict[str, Any]] = None
+        self._primary_interface: Optional[str] = None
+        self._created_dirs: Set[str] = set()
+        self._settings_payload: Optional[bytes] = None
+        self._rendered_configs: Dict[Tuple[Any, ...], str] = {}
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        """Installation settings, loaded from disk on first access."""
+        if self._settings is None:
+            self._load_settings()
+        return self._settings
+
+    @settings.setter
+    def settings(self, value: Dict[str, Any]) -> None:
+        self._settings = value
+        self._rendered_configs.clear()
 
     def _load_settings(self) -> None:
-        if os.path.exists(self.SETTINGS_FILE):
-            try:
-                with open(self.SETTINGS_FILE, "r") as f:
-                    self.settings = json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
-                logger.warning("⚠️  Warning: Could not load settings file: %s", e)
+        self._settings = {}
+        self._settings_payload = None
+        self._rendered_configs.clear()
+        try:
+            st = os.stat(self.SETTINGS_FILE)
+        except FileNotFoundError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = _SETTINGS_CACHE.get(self.SETTINGS_FILE)
+        if cached is not None and cached[0] == stamp:
+            self._settings_payload, parsed = cached[1], cached[2]
+            self._settings = dict(parsed)
+            return
+        try:
+            with open(self.SETTINGS_FILE, "rb") as f:
+                data = f.read()
+            self._settings = orjson.loads(data) if orjson else json.loads(data)
+            self._settings_payload = data
+            _SETTINGS_CACHE[self.SETTINGS_FILE] = (stamp, data, dict(self._settings))
+        except (ValueError, IOError) as e:
+            logger.warning("⚠️  Warning: Could not load settings file: %s", e)
+
+    def _ensure_dir(self, path: str) -> None:
+        """Creates path if needed, skipping directories this instance already created."""
+        if path not in self._created_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._created_dirs.add(path)
 
     def _save_settings(self) -> None:
-        os.makedirs(self.OPENVPN_DIR, exist_ok=True)
-        with open(self.SETTINGS_FILE, "w") as f:
-            json.dump(self.settings, f, indent=4)
+        self._ensure_dir(self.OPENVPN_DIR)
+        if orjson:
+            payload = orjson.dumps(self.settings, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(self.settings, indent=2).encode()
+        if payload == self._settings_payload and os.path.exists(self.SETTINGS_FILE):
+            return
+        _atomic_write_bytes(self.SETTINGS_FILE, payload, 0o600)
+        self._settings_payload = payload
+        st = os.stat(self.SETTINGS_FILE)
+        _SETTINGS_CACHE[self.SETTINGS_FILE] = (
+            (st.st_mtime_ns, st.st_size),
+            payload,
+            dict(self.settings),
+        )
 
     def install_openvpn(self, settings: Dict[str, Any]) -> None:
         logger.info("▶️  Starting OpenVPN installation...")
         self.settings = settings
 
         self._install_prerequisites()
-        self._setup_pki()
-        self._generate_server_configs()
+        # Only the config file generation overlaps the PKI build; firewall,
+        # forwarding, PAM and resolver changes wait until the PKI succeeded.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pki = executor.submit(self._setup_pki)
+            self._generate_server_configs()
+            pki.result()
         self._setup_firewall_rules()
         self._enable_ip_forwarding()
         self._setup_pam()
@@ -99,10 +345,20 @@ class OpenVPNManager(IBackupable):
         if self.settings.get("dns") == "2":
             packages.append("unbound")
 
+        # apt's progress output is only worth buffering when it will be logged.
+        stdout = (
+            subprocess.PIPE if logger.isEnabledFor(logging.DEBUG) else subprocess.DEVNULL
+        )
+
         def _run(cmd: List[str], **kwargs) -> None:
             try:
                 result = subprocess.run(
-                    cmd, check=True, capture_output=True, text=True, **kwargs
+                    cmd,
+                    check=True,
+                    stdout=stdout,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    **kwargs,
                 )
                 if result.stdout:
                     logger.debug(result.stdout.strip())
@@ -115,127 +371,169 @@ class OpenVPNManager(IBackupable):
                     logger.error(exc.stderr.strip())
                 raise
 
-        logger.info("   └── Updating package lists...")
-        _run(["apt-get", "update"])
+        packages = self._missing_packages(packages)
+        if not packages:
+            logger.info("   ✅ Prerequisites already installed")
+            return
+
+        env = {**os.environ, "DEBIAN_FRONTEND": "noninteractive"}
+
+        if self._apt_lists_fresh():
+            logger.info("   └── Package lists are fresh, skipping update")
+        else:
+            logger.info("   └── Updating package lists...")
+            _run(["apt-get", "-o", "Acquire::Retries=3", "update"], env=env)
 
         logger.info("   └── Configuring firewall persistence...")
         _run(
             ["debconf-set-selections"],
-            input="iptables-persistent iptables-persistent/autosave_v4 boolean true\n",
-        )
-        _run(
-            ["debconf-set-selections"],
-            input="iptables-persistent iptables-persistent/autosave_v6 boolean true\n",
+            input=(
+                "iptables-persistent iptables-persistent/autosave_v4 boolean true\n"
+                "iptables-persistent iptables-persistent/autosave_v6 boolean true\n"
+            ),
         )
 
         logger.info("   └── Installing %d packages...", len(packages))
-        env = os.environ.copy()
-        env["DEBIAN_FRONTEND"] = "noninteractive"
-        _run(["apt-get", "install", "-y"] + packages, env=env)
+        _run(
+            ["apt-get", "-o", "Acquire::Retries=3", "install", "--no-install-recommends", "-y"]
+            + packages,
+            env=env,
+        )
         logger.info("   ✅ Prerequisites installed")
 
+    @classmethod
+    def _apt_lists_fresh(cls) -> bool:
+        """Whether apt's package lists were refreshed within _APT_MAX_AGE seconds.
+
+        Only markers touched by apt-get update count: pkgcache.bin is rebuilt
+        by any install, so it would make stale lists look fresh.
+        """
+        newest = 0.0
+        for stamp in cls._APT_UPDATE_STAMPS:
+            try:
+                newest = max(newest, os.stat(stamp).st_mtime)
+            except OSError:
+                continue
+        return time.time() - newest < cls._APT_MAX_AGE
+
+    @staticmethod
+    def _missing_packages(packages: List[str]) -> List[str]:
+        """Returns the packages that dpkg does not report as installed, in one query."""
+        result = subprocess.run(
+            ["dpkg-query", "-W", "-f=${Package} ${Status}\n", *packages],
+            capture_output=True,
+            text=True,
+        )
+        installed = {
+            line.split(" ", 1)[0]
+            for line in result.stdout.splitlines()
+            if line.endswith(" install ok installed")
+        }
+        return [package for package in packages if package not in installed]
+
     def _setup_pki(self) -> None:
         logger.info("[2/7] Setting up Public Key Infrastructure (PKI)...")
 
-        logger.info("   └── Preparing Easy-RSA environment...")
-        if os.path.exists(self.EASYRSA_DIR):
-            shutil.rmtree(self.EASYRSA_DIR)
-        shutil.copytree("/usr/share/easy-rsa/", self.EASYRSA_DIR)
+        logger.info("   └── [PKI] Preparing Easy-RSA environment...")
+        shutil.rmtree(self.EASYRSA_DIR, ignore_errors=True)
+        # Restore extracts the backed-up easy-rsa tree onto /, so it must be a
+        # real copy rather than links into the package's own files.
+        shutil.copytree(self.EASYRSA_SOURCE_DIR, self.EASYRSA_DIR)
         easyrsa_script_path = os.path.join(self.EASYRSA_DIR, "easyrsa")
-        os.chmod(easyrsa_script_path, 0o755)
-
-        with working_directory(self.EASYRSA_DIR):
-            with open("vars", "w") as f:
-                f.write('set_var EASYRSA_ALGO "ec"\n')
-                f.write('set_var EASYRSA_CURVE "prime256v1"\n')
-
-            import random
-            import string
+        # The packaged script ships executable and copytree keeps its mode.
+        if not os.access(easyrsa_script_path, os.X_OK):
+            os.chmod(easyrsa_script_path, 0o755)
 
-            server_cn = f"cn_{''.join(random.choices(string.ascii_letters + string.digits, k=16))}"
-            server_name = f"server_{''.join(random.choices(string.ascii_letters + string.digits, k=16))}"
+        _atomic_write_bytes(
+            os.path.join(self.EASYRSA_DIR, "vars"),
+            f'set_var EASYRSA_ALGO "ec"\nset_var EASYRSA_CURVE "{self.EC_CURVE}"\n'.encode(),
+        )
 
-            logger.info("   └── Initializing PKI structure...")
-            subprocess.run(["./easyrsa", "init-pki"], check=True, capture_output=True)
+        server_cn = f"cn_{secrets.token_hex(8)}"
+        server_name = f"server_{secrets.token_hex(8)}"
 
-            logger.info("   └── Generating Certificate Authority...")
-            subprocess.run(
-                ["./easyrsa", "--batch", f"--req-cn={server_cn}", "build-ca", "nopass"],
-                check=True,
-                capture_output=True,
-                env={**os.environ, "EASYRSA_CA_EXPIRE": "3650"},
-            )
-
-            logger.info("   └── Creating server certificate...")
-            subprocess.run(
-                ["./easyrsa", "--batch", "build-server-full", server_name, "nopass"],
+        # The tls-crypt key does not depend on the CA, so generate it while
+        # Easy-RSA builds the PKI.
+        logger.info("   └── [PKI] Creating TLS encryption key...")
+        genkey_cmd = ["openvpn", "--genkey", "--secret", "/etc/openvpn/tls-crypt.key"]
+        genkey = subprocess.Popen(
+            genkey_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        try:
+            logger.info("   └── [PKI] Building CA, server certificate and revocation list...")
+            _silent_run(
+                ["bash", "-ec", self._PKI_SCRIPT, "easyrsa-pki", server_cn, server_name],
+                cwd=self.EASYRSA_DIR,
                 check=True,
-                capture_output=True,
-                env={**os.environ, "EASYRSA_CERT_EXPIRE": "3650"},
             )
-
-            logger.info("   └── Generating certificate revocation list...")
-            subprocess.run(
-                ["./easyrsa", "gen-crl"],
-                check=True,
-                capture_output=True,
-                env={**os.environ, "EASYRSA_CRL_DAYS": "3650"},
+        finally:
+            _, genkey_stderr = genkey.communicate()
+        if genkey.returncode != 0:
+            raise subprocess.CalledProcessError(
+                genkey.returncode, genkey_cmd, stderr=genkey_stderr
             )
-
-            logger.info("   └── Creating TLS encryption key...")
-            subprocess.run(
-                ["openvpn", "--genkey", "--secret", "/etc/openvpn/tls-crypt.key"],
-                check=True,
-                capture_output=True,
+        if os.path.exists("/etc/openvpn/tls-crypt.key"):
+            self._ensure_dir("/etc/openvpn/server")
+            self._link_or_copy(
+                "/etc/openvpn/tls-crypt.key", "/etc/openvpn/server/tls-crypt.key"
             )
-            if os.path.exists("/etc/openvpn/tls-crypt.key"):
-                os.makedirs("/etc/openvpn/server", exist_ok=True)
-                shutil.copy("/etc/openvpn/tls-crypt.key", "/etc/openvpn/server/")
 
-            logger.info("   └── Installing certificates...")
-            shutil.copy(f"{self.PKI_DIR}/ca.crt", "/etc/openvpn/")
-            shutil.copy(f"{self.PKI_DIR}/private/ca.key", "/etc/openvpn/")
+        logger.info("   └── [PKI] Installing certificates...")
+        self._ensure_dir("/etc/openvpn/server")
+        self._ensure_dir(self.OPENVPN_DIR)
+        # The PKI is part of the backup, so the served copies are not
+        # hardlinked to it: restoring would rewrite them in place.
+        shutil.copy(f"{self.PKI_DIR}/private/ca.key", "/etc/openvpn/ca.key")
+        for target_dir in ("/etc/openvpn", "/etc/openvpn/server", self.OPENVPN_DIR):
+            shutil.copy(f"{self.PKI_DIR}/ca.crt", f"{target_dir}/ca.crt")
             shutil.copy(
                 f"{self.PKI_DIR}/issued/{server_name}.crt",
-                "/etc/openvpn/server-cert.crt",
+                f"{target_dir}/server-cert.crt",
             )
             shutil.copy(
                 f"{self.PKI_DIR}/private/{server_name}.key",
-                "/etc/openvpn/server-cert.key",
-            )
-            shutil.copy(f"{self.PKI_DIR}/crl.pem", "/etc/openvpn/")
-            os.chmod("/etc/openvpn/crl.pem", 0o644)
-
-            os.makedirs("/etc/openvpn/server", exist_ok=True)
-            shutil.copy(f"{self.PKI_DIR}/ca.crt", "/etc/openvpn/server/")
-            shutil.copy(
-                f"{self.PKI_DIR}/issued/{server_name}.crt",
-                "/etc/openvpn/server/server-cert.crt",
+                f"{target_dir}/server-cert.key",
             )
-            shutil.copy(
-                f"{self.PKI_DIR}/private/{server_name}.key",
-                "/etc/openvpn/server/server-cert.key",
-            )
-            shutil.copy(f"{self.PKI_DIR}/crl.pem", "/etc/openvpn/server/")
-            os.chmod("/etc/openvpn/server/crl.pem", 0o644)
-
-            shutil.copy(f"{self.PKI_DIR}/ca.crt", self.OPENVPN_DIR)
-            shutil.copy(
-                f"{self.PKI_DIR}/issued/{server_name}.crt",
-                f"{self.OPENVPN_DIR}/server-cert.crt",
-            )
-            shutil.copy(
-                f"{self.PKI_DIR}/private/{server_name}.key",
-                f"{self.OPENVPN_DIR}/server-cert.key",
-            )
-            shutil.copy(f"{self.PKI_DIR}/crl.pem", self.OPENVPN_DIR)
-            logger.info("   ✅ PKI setup complete")
+        self._publish_crl()
+        logger.info("   ✅ [PKI] Setup complete")
+
+    def _publish_crl(self) -> None:
+        """Atomically writes the current CRL into every directory the servers read it from.
+
+        crl.pem is regenerated in place by gen-crl, so it is copied rather
+        than hardlinked; it is read once and written world-readable so the
+        unprivileged OpenVPN processes can re-read it.
+        """
+        with open(f"{self.PKI_DIR}/crl.pem", "rb") as f:
+            crl = f.read()
+        for target_dir in self._CRL_TARGET_DIRS + (self.OPENVPN_DIR,):
+            _atomic_write_bytes(f"{target_dir}/crl.pem", crl, 0o644)
+
+    @staticmethod
+    def _link_or_copy(src: str, dst: str) -> None:
+        """Hardlinks src over dst, falling back to a copy across filesystems.
+
+        Only used for sources outside the backed-up trees: restore writes
+        backed-up files in place, which would also rewrite every hardlink.
+        """
+        tmp_path = f"{dst}.tmp"
+        try:
+            os.link(src, tmp_path)
+            os.replace(tmp_path, dst)
+        except OSError:
+            _unlink_quietly(tmp_path)
+            try:
+                if os.path.samefile(src, dst):
+                    return
+            except FileNotFoundError:
+                pass
+            shutil.copy(src, dst)
 
     def _generate_server_configs(self) -> None:
         logger.info("[3/7] Generating server configurations...")
 
         logger.info("   └── Creating directory structure...")
-        os.makedirs(self.SERVER_CONFIG_DIR, exist_ok=True)
+        self._ensure_dir(self.SERVER_CONFIG_DIR)
 
         # Link scripts directory instead of copying files
         scripts_dir = VPNPaths.get_scripts_dir()
@@ -251,10 +549,11 @@ class OpenVPNManager(IBackupable):
             os.symlink(scripts_dir, openvpn_scripts_dir)
 
             # Ensure scripts are executable
-            for script_name in ["on_connect.py", "on_disconnect.py"]:
-                script_path = os.path.join(scripts_dir, script_name)
-                if os.path.exists(script_path):
-                    os.chmod(script_path, 0o755)
+            for script_name in ("on_connect.py", "on_disconnect.py"):
+                try:
+                    os.chmod(os.path.join(scripts_dir, script_name), 0o755)
+                except FileNotFoundError:
+                    pass
             os.chmod(scripts_dir, 0o755)
 
             # Link environment file for script access
@@ -269,19 +568,23 @@ class OpenVPNManager(IBackupable):
                     shutil.copy(env_source, env_target)
                 os.chmod(env_target, 0o600)
 
+        # Resolve the unprivileged owner once for every chown below
+        nobody_uid = pwd.getpwnam("nobody").pw_uid
+        nogroup_gid = grp.getgrnam("nogroup").gr_gid
+
         # Ensure database file has correct permissions
         db_file = VPNPaths.get_database_file()
         db_dir = os.path.dirname(db_file)
-        os.makedirs(db_dir, exist_ok=True)
+        self._ensure_dir(db_dir)
         try:
-            shutil.chown(db_dir, user="nobody", group="nogroup")
+            os.chown(db_dir, nobody_uid, nogroup_gid)
             os.chmod(db_dir, 0o770)
         except Exception as e:
             print(f"   └── Warning: could not set permissions on {db_dir}: {e}")
 
         if os.path.exists(db_file) and not os.access(db_file, os.W_OK):
             try:
-                shutil.chown(db_file, user="nobody", group="nogroup")
+                os.chown(db_file, nobody_uid, nogroup_gid)
                 os.chmod(db_file, 0o660)
             except Exception as e:
                 print(f"   └── Warning: could not set permissions on {db_file}: {e}")
@@ -293,120 +596,151 @@ class OpenVPNManager(IBackupable):
         ]
 
         for path in system_dirs:
-            os.makedirs(path, exist_ok=True)
-            shutil.chown(path, user="nobody", group="nogroup")
+            self._ensure_dir(path)
+            os.chown(path, nobody_uid, nogroup_gid)
 
         # CCD directory should be in the OpenVPN system directory
-        os.makedirs(OpenVPNConstants.CCD_DIR, exist_ok=True)
-        shutil.chown(OpenVPNConstants.CCD_DIR, user="nobody", group="nogroup")
+        self._ensure_dir(OpenVPNConstants.CCD_DIR)
+        os.chown(OpenVPNConstants.CCD_DIR, nobody_uid, nogroup_gid)
 
         # Remove this line as we're using specific configs now
 
         logger.info("   └── Generating certificate-based server config...")
-        base_config = self._get_base_config()
-        cert_monitoring_config = self._get_monitoring_config(service_type="cert")
-        cert_config = (
-            base_config.format(
-                port=self.settings["cert_port"],
-                proto=self.settings["cert_proto"],
-                extra_auth="",
-            )
-            + cert_monitoring_config
-        )
-        # Write to /etc/openvpn/server/server-cert.conf for systemd service
-        os.makedirs("/etc/openvpn/server", exist_ok=True)
-        with open("/etc/openvpn/server/server-cert.conf", "w") as f:
-            f.write(cert_config)
-        # Also write to legacy location for compatibility
-        with open("/etc/openvpn/server-cert.conf", "w") as f:
-            f.write(cert_config)
-        # Also write to config directory for management
-        with open(f"{self.SERVER_CONFIG_DIR}/server-cert.conf", "w") as f:
-            f.write(cert_config)
+        cert_config = self._get_base_config(
+            port=self.settings["cert_port"], proto=self.settings["cert_proto"]
+        ) + self._get_monitoring_config(service_type="cert")
 
         logger.info("   └── Generating login-based server config...")
-        login_config = self._get_login_config()
-        login_monitoring_config = self._get_monitoring_config(service_type="login")
-        # Write to /etc/openvpn/server/server-login.conf for systemd service
-        with open("/etc/openvpn/server/server-login.conf", "w") as f:
-            f.write(login_config + login_monitoring_config)
-        # Also write to legacy location for compatibility
-        with open("/etc/openvpn/server-login.conf", "w") as f:
-            f.write(login_config + login_monitoring_config)
-        # Also write to config directory for management
-        with open(f"{self.SERVER_CONFIG_DIR}/server-login.conf", "w") as f:
-            f.write(login_config + login_monitoring_config)
+        login_config = self._get_login_config() + self._get_monitoring_config(
+            service_type="login"
+        )
+
+        # SERVER_CONFIG_DIR (/etc/openvpn/server) is what the systemd units
+        # read; the legacy /etc/openvpn copies are hardlinks to the same file.
+        self._ensure_dir(self.SERVER_CONFIG_DIR)
+        for name, config_text in (
+            ("server-cert.conf", cert_config),
+            ("server-login.conf", login_config),
+        ):
+            config_path = f"{self.SERVER_CONFIG_DIR}/{name}"
+            _atomic_write_bytes(config_path, config_text.encode())
+            self._link_or_copy(config_path, f"/etc/openvpn/{name}")
         logger.info("   ✅ Server configurations created with monitoring hooks")
 
     def _setup_firewall_rules(self) -> None:
-        # This method remains unchanged
         logger.info("[4/7] Setting up firewall rules...")
 
         logger.info("   └── Detecting network interface...")
         net_interface = self._get_primary_interface()
         logger.info("   └── Using interface: %s", net_interface)
 
-        logger.info("   └── Configuring NAT rules for certificate-based VPN...")
-        check_command = f"iptables -t nat -C POSTROUTING -s 10.8.0.0/24 -o {net_interface} -j MASQUERADE"
-        if (
-            subprocess.run(
-                check_command, shell=True, capture_output=True, text=True
-            ).returncode
-            != 0
-        ):
+        logger.info(
+            "   └── Configuring NAT rules for %s VPN...",
+            " and ".join(label for label, _ in self._NAT_SUBNETS),
+        )
+        current_rules = set(
             subprocess.run(
-                f"iptables -t nat -A POSTROUTING -s 10.8.0.0/24 -o {net_interface} -j MASQUERADE",
-                shell=True,
+                ["iptables-save", "-t", "nat"],
                 check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.splitlines()
+        )
+        missing_rules = [
+            rule
+            for rule in (
+                " ".join(["-A", "POSTROUTING", *argv])
+                for argv in self._nat_rules(net_interface)
             )
-
-        logger.info("   └── Configuring NAT rules for login-based VPN...")
-        check_command = f"iptables -t nat -C POSTROUTING -s 10.9.0.0/24 -o {net_interface} -j MASQUERADE"
-        if (
-            subprocess.run(
-                check_command, shell=True, capture_output=True, text=True
-            ).returncode
-            != 0
-        ):
+            if rule not in current_rules
+        ]
+        if missing_rules:
             subprocess.run(
-                f"iptables -t nat -A POSTROUTING -s 10.9.0.0/24 -o {net_interface} -j MASQUERADE",
-                shell=True,
+                ["iptables-restore", "--noflush"],
+                input="*nat\n" + "\n".join(missing_rules) + "\nCOMMIT\n",
+                text=True,
                 check=True,
             )
         logger.info("   └── Saving firewall rules...")
-        os.makedirs(os.path.dirname(self.FIREWALL_RULES_V4), exist_ok=True)
-        subprocess.run(
-            f"iptables-save > {self.FIREWALL_RULES_V4}", shell=True, check=True
-        )
+        self._ensure_dir(os.path.dirname(self.FIREWALL_RULES_V4))
+        # Dump into a sibling file and rename it over the saved rules so a
+        # failed or interrupted iptables-save never leaves rules.v4 truncated.
+        tmp_path = f"{self.FIREWALL_RULES_V4}.tmp"
+        try:
+            with open(tmp_path, "wb") as rules_file:
+                subprocess.run(["iptables-save"], stdout=rules_file, check=True)
+                os.fsync(rules_file.fileno())
+            os.replace(tmp_path, self.FIREWALL_RULES_V4)
+        except BaseException:
+            _unlink_quietly(tmp_path)
+            raise
         logger.info("   ✅ Firewall rules configured")
 
+    def _nat_rules(self, net_interface: str) -> List[List[str]]:
+        """Returns the POSTROUTING rule arguments for every VPN subnet."""
+        return [
+            [arg.format(subnet=subnet, nic=net_interface) for arg in self._NAT_RULE_TEMPLATE]
+            for _, subnet in self._NAT_SUBNETS
+        ]
+
     def _enable_ip_forwarding(self) -> None:
-        # This method remains unchanged
+        """Persists net.ipv4.ip_forward=1 and applies it to the running kernel.
+
+        install.sh shares the drop-in and may add IPv6 forwarding to it, so
+        the IPv4 line is appended rather than replacing the file.
+        """
         logger.info("[5/7] Enabling IP forwarding...")
         logger.info("   └── Configuring kernel parameters...")
-        with open("/etc/sysctl.conf", "r+") as f:
-            content = f.read()
-            if "net.ipv4.ip_forward=1" not in content:
-                f.seek(0, 2)
-                f.write("\nnet.ipv4.ip_forward=1\n")
-        logger.info("   └── Applying kernel parameters...")
-        subprocess.run(["sysctl", "-p"], check=True, capture_output=True)
+        setting = b"net.ipv4.ip_forward=1"
+        try:
+            with open(self.SYSCTL_CONFIG, "rb") as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = b""
+        if setting not in current.splitlines():
+            if current and not current.endswith(b"\n"):
+                current += b"\n"
+            _atomic_write_bytes(self.SYSCTL_CONFIG, current + setting + b"\n")
+        try:
+            with open(self._PROC_IP_FORWARD, "rb") as f:
+                forwarding = f.read(1) == b"1"
+        except FileNotFoundError:
+            forwarding = False
+        if not forwarding:
+            logger.info("   └── Applying kernel parameters...")
+            with open(self._PROC_IP_FORWARD, "w") as f:
+                f.write("1\n")
         logger.info("   ✅ IP forwarding enabled")
 
     def _setup_pam(self) -> None:
-        # This method remains unchanged
         logger.info("[6/7] Configuring PAM for OpenVPN...")
         logger.info("   └── Setting up username/password authentication...")
         pam_config = (
-            "auth required pam_unix.so shadow nodelay\naccount required pam_unix.so\n"
+            b"auth required pam_unix.so shadow nodelay\naccount required pam_unix.so\n"
         )
-        with open("/etc/pam.d/openvpn", "w") as f:
-            f.write(pam_config)
+        _atomic_write_bytes("/etc/pam.d/openvpn", pam_config)
         logger.info("   ✅ PAM authentication configured")
 
     def _setup_unbound(self) -> None:
-        # This method remains unchanged
-        pass
+        """Writes a cache-tuned Unbound resolver config for the VPN subnets and starts it."""
+        logger.info("   └── Configuring Unbound DNS resolver...")
+        threads = os.cpu_count() or 2
+        networks = [ipaddress.ip_network(subnet) for _, subnet in self._NAT_SUBNETS]
+        subnet_lines = [f"    interface: {network[1]}" for network in networks]
+        subnet_lines += [f"    access-control: {network} allow" for network in networks]
+        unbound_config = self._UNBOUND_TEMPLATE.format(
+            subnet_lines="\n".join(subnet_lines),
+            threads=threads,
+            slabs=1 << (threads - 1).bit_length(),
+            msg_cache=self.settings.get("unbound_msg_cache_size", "32m"),
+            rrset_cache=self.settings.get("unbound_rrset_cache_size", "64m"),
+        )
+        self._ensure_dir(os.path.dirname(self.UNBOUND_CONFIG))
+        _atomic_write_bytes(self.UNBOUND_CONFIG, unbound_config.encode())
+        _silent_run(["unbound-checkconf"], check=True)
+        self._systemctl(["enable"], ["unbound"])
+        self._systemctl(["restart"], ["unbound"])
+        logger.info("   ✅ Unbound resolver configured")
 
     def _start_openvpn_services(self, silent: bool = False) -> None:
         """Enables and starts OpenVPN services."""
@@ -414,140 +748,222 @@ class OpenVPNManager(IBackupable):
             logger.info("[7/7] Starting all services...")
             logger.info("   └── Reloading systemd daemon...")
 
-        subprocess.run(["systemctl", "daemon-reload"], check=True, capture_output=True)
+        _silent_run(["systemctl", "daemon-reload"], check=True)
 
-        services_to_manage = [
-            "openvpn-server@server-cert",
-            "openvpn-server@server-login",
-        ]
-
-        for service in services_to_manage:
-            if not silent:
-                logger.info("   └── Enabling %s...", service)
-            subprocess.run(
-                ["systemctl", "enable", service], check=True, capture_output=True
-            )
-            if not silent:
-                logger.info("   └── (Re)starting %s...", service)
-            subprocess.run(
-                ["systemctl", "restart", service], check=True, capture_output=True
-            )
+        if not silent:
+            logger.info("   └── Enabling %s...", ", ".join(self._VPN_SERVICES))
+        self._systemctl(["enable"], self._VPN_SERVICES)
+        if not silent:
+            logger.info("   └── (Re)starting %s...", ", ".join(self._VPN_SERVICES))
+        self._systemctl(["restart"], self._VPN_SERVICES)
 
         if not silent:
             logger.info("   ✅ All services started and enabled.")
 
+    def disable_services(self, units: Sequence[str]) -> None:
+        """Stops and disables the given systemd units, ignoring ones that do not exist."""
+        self._systemctl(["disable", "--now"], units, check=False)
+
+    @staticmethod
+    def _systemctl(args: List[str], units: Sequence[str], check: bool = True) -> None:
+        """Applies one systemctl command to several units in a single invocation.
+
+        When check is False and the batched call fails (for example because
+        one unit does not exist), the command is retried per unit so the
+        remaining units are still handled.
+        """
+        result = _silent_run(["systemctl", *args, *units], check=check)
+        if result.returncode != 0 and len(units) > 1:
+            for unit in units:
+                _silent_run(["systemctl", *args, unit], check=False)
+
     def create_user_certificate(self, username: Username) -> None:
-        # This method remains unchanged
-        os.chdir(self.EASYRSA_DIR)
-        subprocess.run(
+        """Issues a client certificate for the user via Easy-RSA."""
+        _silent_run(
             ["./easyrsa", "--batch", "build-client-full", username, "nopass"],
+            cwd=self.EASYRSA_DIR,
             check=True,
-            capture_output=True,
         )
 
+    def create_user_certificates(self, usernames: Sequence[Username]) -> None:
+        """Issues client certificates for several users.
+
+        Easy-RSA 3.0.x rewrites pki/safessl-easyrsa.cnf on every request and
+        its CA database is not safe for concurrent writers, so all
+        certificates are built serially in one shell loop instead of one
+        Python round trip per user.
+        """
+        if len(usernames) == 1:
+            self.create_user_certificate(usernames[0])
+            return
+
+        if usernames:
+            _silent_run(
+                [
+                    "bash",
+                    "-ec",
+                    'for u; do ./easyrsa --batch build-client-full "$u" nopass; done',
+                    "easyrsa-build",
+                    *usernames,
+                ],
+                cwd=self.EASYRSA_DIR,
+                check=True,
+            )
+
     def revoke_user_certificate(self, username: Username) -> None:
-        # This method remains unchanged
-        cert_path = f"{self.PKI_DIR}/issued/{username}.crt"
-        if not os.path.exists(cert_path):
+        """Revokes the user's certificate, republishes the CRL and restarts services."""
+        self.revoke_user_certificates([username])
+
+    def revoke_user_certificates(self, usernames: Sequence[Username]) -> None:
+        """Revokes several certificates, then regenerates the CRL and restarts once."""
+        usernames = [
+            username
+            for username in usernames
+            if os.path.exists(f"{self.PKI_DIR}/issued/{username}.crt")
+        ]
+        if not usernames:
             return
-        os.chdir(self.EASYRSA_DIR)
+        if len(usernames) == 1:
+            revoke_cmd = ["./easyrsa", "--batch", "revoke", usernames[0]]
+        else:
+            revoke_cmd = [
+                "bash",
+                "-c",
+                'for u; do ./easyrsa --batch revoke "$u" || true; done',
+                "easyrsa-revoke",
+                *usernames,
+            ]
         subprocess.run(
-            ["./easyrsa", "--batch", "revoke", username],
+            revoke_cmd,
+            cwd=self.EASYRSA_DIR,
             check=False,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
         subprocess.run(
             ["./easyrsa", "gen-crl"],
+            cwd=self.EASYRSA_DIR,
             check=True,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
-        shutil.copy(f"{self.PKI_DIR}/crl.pem", self.OPENVPN_DIR)
-        self._start_openvpn_services(silent=True)
+        self._publish_crl()
+        # The units are already installed and enabled; only a restart is
+        # needed for the servers to pick up the new CRL.
+        self._systemctl(["restart"], self._VPN_SERVICES)
 
     def generate_user_config(self, username: Username) -> ConfigData:
-        # This method remains unchanged
-        ca_cert = self._read_file("/etc/openvpn/ca.crt")
+        """Builds the certificate-based client config for an issued user certificate."""
         user_cert = self._extract_certificate(f"{self.PKI_DIR}/issued/{username}.crt")
         user_key = self._read_file(f"{self.PKI_DIR}/private/{username}.key")
-        tls_crypt_key = self._read_file("/etc/openvpn/tls-crypt.key")
-
-        user_specific_certs = USER_CERTS_TEMPLATE.format(
-            user_cert=user_cert, user_key=user_key
-        )
-
-        return CLIENT_TEMPLATE.format(
+        return self._render_client_config(
+            CLIENT_TEMPLATE,
+            user_cert,
+            user_key,
             proto=self.settings.get("cert_proto", "udp"),
             server_ip=self.settings.get("public_ip"),
             port=self.settings.get("cert_port", "1194"),
-            ca_cert=ca_cert,
-            user_specific_certs=user_specific_certs,
-            tls_crypt_key=tls_crypt_key,
         )
 
-    def get_shared_config(self) -> ConfigData:
-        # This method remains unchanged
-        ca_cert = self._read_file("/etc/openvpn/ca.crt")
+    def generate_user_configs(
+        self, usernames: Sequence[Username]
+    ) -> Dict[Username, ConfigData]:
+        """Builds client configs for several users, reading their files concurrently.
+
+        Settings and the shared CA and tls-crypt key are loaded once up front
+        so the worker threads only read each user's own certificate and key.
+        """
+        self._get_server_keys()
+        if self._settings is None:
+            self._load_settings()
+        workers = min(32, (os.cpu_count() or 1) * 4, max(len(usernames), 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(usernames, executor.map(self.generate_user_config, usernames)))
 
-        if not os.path.exists(f"{self.PKI_DIR}/issued/main.crt"):
-            os.chdir(self.EASYRSA_DIR)
-            subprocess.run(
+    def get_shared_config(self) -> ConfigData:
+        """Builds the shared login-based client config, issuing the main certificate if needed.
+
+        The result is memoized until settings change or any of the
+        certificate and key files it embeds is rewritten.
+        """
+        main_cert_path = f"{self.PKI_DIR}/issued/main.crt"
+        main_key_path = f"{self.PKI_DIR}/private/main.key"
+        if not os.path.exists(main_cert_path):
+            _silent_run(
                 ["./easyrsa", "--batch", "build-client-full", "main", "nopass"],
+                cwd=self.EASYRSA_DIR,
                 check=True,
-                capture_output=True,
             )
 
-        main_cert = self._extract_certificate(f"{self.PKI_DIR}/issued/main.crt")
-        main_key = self._read_file(f"{self.PKI_DIR}/private/main.key")
-        tls_crypt_key = self._read_file("/etc/openvpn/tls-crypt.key")
+        key = ("shared",) + tuple(
+            self._mtime_ns(path)
+            for path in (main_cert_path, main_key_path, *self._SERVER_KEY_FILES)
+        )
+        rendered = self._rendered_configs.get(key)
+        if rendered is not None:
+            return rendered
+
+        main_cert = self._extract_certificate(main_cert_path)
+        main_key = self._read_file(main_key_path)
 
         if not main_cert or not main_key:
             raise RuntimeError("Main certificate not found. Please reinstall.")
 
-        server_protocol = self.settings.get("login_proto", "udp")
-        server_ip = self.settings.get("public_ip")
-        server_port = self.settings.get("login_port", "1195")
-        cipher = self.settings.get("cipher", "AES-256-GCM")
-        auth = "SHA256"
+        rendered = self._rendered_configs[key] = self._render_client_config(
+            SHARED_CLIENT_TEMPLATE,
+            main_cert,
+            main_key,
+            proto=self.settings.get("login_proto", "udp"),
+            server_ip=self.settings.get("public_ip"),
+            port=self.settings.get("login_port", "1195"),
+            cipher=self.settings.get("cipher", "AES-256-GCM"),
+        )
+        return rendered
+
+    def _render_client_config(
+        self, template: str, cert: str, key: str, **options: Any
+    ) -> ConfigData:
+        """Fills a client template with the server CA, TLS key and the given cert/key pair."""
+        ca_cert, tls_crypt_key = self._get_server_keys()
+        return _compose_client_template(template).format(
+            ca_cert=ca_cert,
+            tls_crypt_key=tls_crypt_key,
+            user_cert=cert,
+            user_key=key,
+            **options,
+        )
 
-        config = f"""client
-dev tun
-proto {server_protocol}
-remote {server_ip} {server_port}
-resolv-retry infinite
-nobind
-persist-key
-persist-tun
-auth-user-pass
-remote-cert-tls server
-verb 3
-cipher {cipher}
-auth {auth}
-tls-version-min 1.2
-<ca>
-{ca_cert}
-</ca>
-<cert>
-{main_cert}
-</cert>
-<key>
-{main_key}
-</key>
-<tls-crypt>
-{tls_crypt_key}
-</tls-crypt>"""
-
-        return config
+    def _get_server_keys(self) -> Tuple[str, str]:
+        """Returns the CA certificate and tls-crypt key, re-read only when either file changes."""
+        ca_path, tls_crypt_path = self._SERVER_KEY_FILES
+        return self._read_static_file(ca_path), self._read_static_file(tls_crypt_path)
+
+    def _read_static_file(self, path: str) -> str:
+        """Like _read_file, but shared across instances until the file's mtime changes."""
+        mtime = self._mtime_ns(path)
+        cached = _FILE_CACHE.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        content = self._read_file(path)
+        _FILE_CACHE[path] = (mtime, content)
+        return content
+
+    @staticmethod
+    def _mtime_ns(path: str) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return -1
 
     def uninstall_openvpn(self, silent: bool = False) -> None:
         """Completely removes all OpenVPN services, files, and processes."""
+        self._created_dirs.clear()
         if not silent:
             logger.info("▶️  Starting complete uninstallation...")
 
         if not silent:
             logger.info("   └── Force killing all OpenVPN processes...")
-        subprocess.run(["killall", "-9", "openvpn"], check=False, capture_output=True)
+        _silent_run(["killall", "-9", "openvpn"], check=False)
 
         if not silent:
             logger.info("   └── Stopping and disabling services...")
@@ -557,20 +973,21 @@ tls-version-min 1.2
             "openvpn-server@server-login",
             "openvpn@server",
         ]
-        for service in services_to_stop:
-            subprocess.run(
-                ["systemctl", "stop", service], check=False, capture_output=True
-            )
-            subprocess.run(
-                ["systemctl", "disable", service], check=False, capture_output=True
-            )
+        self.disable_services(services_to_stop)
 
         if not silent:
             logger.info("   └── Removing service files...")
         monitor_service_file = "/etc/systemd/system/openvpn-monitor.service"
-        if os.path.exists(monitor_service_file):
-            os.remove(monitor_service_file)
-        subprocess.run(["systemctl", "daemon-reload"], check=False, capture_output=True)
+        self._remove_path(monitor_service_file)
+        _silent_run(["systemctl", "daemon-reload"], check=False)
+
+        if not silent:
+            logger.info("   └── Removing NAT rules...")
+        for rule in self._nat_rules(self._get_primary_interface()):
+            _silent_run(
+                ["iptables", "-t", "nat", "-D", "POSTROUTING", *rule],
+                check=False,
+            )
 
         if not silent:
             logger.info("   └── Cleaning configuration files...")
@@ -582,10 +999,11 @@ tls-version-min 1.2
             "/etc/openvpn/server/server-login.conf",
             "/etc/pam.d/openvpn",
             self.FIREWALL_RULES_V4,
+            self.UNBOUND_CONFIG,
+            self.SYSCTL_CONFIG,
         ]
         for path in config_paths:
-            if os.path.exists(path):
-                os.remove(path)
+            self._remove_path(path)
 
         if not silent:
             logger.info("   └── Removing directories...")
@@ -599,12 +1017,7 @@ tls-version-min 1.2
             "/var/run/openvpn",
         ]
         for path in directories_to_remove:
-            if not os.path.exists(path):
-                continue
-            if os.path.islink(path) or os.path.isfile(path):
-                os.remove(path)
-            else:
-                shutil.rmtree(path)
+            self._remove_path(path)
 
         if not silent:
             logger.info("   └── Removing certificate files...")
@@ -617,8 +1030,7 @@ tls-version-min 1.2
             "/etc/openvpn/tls-crypt.key",
         ]
         for path in cert_files:
-            if os.path.exists(path):
-                os.remove(path)
+            self._remove_path(path)
 
         if not silent:
             logger.info("   └── Final process cleanup...")
@@ -628,12 +1040,21 @@ tls-version-min 1.2
         packages = ["openvpn", "easy-rsa", "iptables-persistent"]
         if os.path.exists("/etc/unbound"):
             packages.append("unbound")
-        subprocess.run(
-            ["apt-get", "remove", "--purge", "-y"] + packages,
-            check=True,
-            capture_output=True,
+        purge = _silent_run(
+            ["apt-get", "autoremove", "--purge", "-y"] + packages,
+            stdin=subprocess.DEVNULL,
+            env={**os.environ, "DEBIAN_FRONTEND": "noninteractive"},
+            text=True,
         )
-        subprocess.run(["apt-get", "autoremove", "-y"], check=True, capture_output=True)
+        if purge.returncode != 0:
+            logger.error(
+                "❌ Package purge failed (exit status %d): %s",
+                purge.returncode,
+                purge.stderr.strip(),
+            )
+            raise subprocess.CalledProcessError(
+                purge.returncode, purge.args, stderr=purge.stderr
+            )
 
         if not silent:
             logger.info("✅ Complete uninstallation finished. All ports freed.")
@@ -644,178 +1065,170 @@ tls-version-min 1.2
 
     def pre_restore(self) -> None:
         """Stops all related services before a restore operation."""
-        services_to_stop = [
-            "openvpn-uds-monitor",
-            "openvpn-server@server-cert",
-            "openvpn-server@server-login",
-        ]
-        for service in services_to_stop:
-            subprocess.run(
-                ["systemctl", "stop", service], check=False, capture_output=True
-            )
+        self._systemctl(
+            ["stop"], ["openvpn-uds-monitor", *self._VPN_SERVICES], check=False
+        )
 
     def post_restore(self) -> None:
-        # This method remains unchanged
+        """Restores ownership and permissions on restored assets, then restarts services."""
+        self._fix_perms(self.PKI_DIR)
+        try:
+            os.chown(self.SETTINGS_FILE, 0, 0)
+            os.chmod(self.SETTINGS_FILE, 0o600)
+        except FileNotFoundError:
+            pass
         self._load_settings()
+        # Restored files may carry their original mtimes; drop cached copies.
+        for path in self._SERVER_KEY_FILES:
+            _FILE_CACHE.pop(path, None)
         self._start_openvpn_services(silent=True)
-
-    def _get_base_config(self) -> str:
-        # Use VPNPaths for all certificate and key paths
-        from config.paths import VPNPaths
-
-        dns_lines = {
-            "1": "",
-            "2": f'push "dhcp-option DNS 10.8.0.1"',
-            "3": 'push "dhcp-option DNS 1.1.1.1"\npush "dhcp-option DNS 1.0.0.1"',
-            "4": 'push "dhcp-option DNS 8.8.8.8"\npush "dhcp-option DNS 8.8.4.4"',
-            "5": 'push "dhcp-option DNS 94.140.14.14"\npush "dhcp-option DNS 94.140.15.15"',
-        }.get(self.settings.get("dns", "3"), "")
-
-        cipher_config = self.settings.get("cipher", "AES-256-GCM") + ":AES-128-GCM"
-        cc_cipher_config = (
-            "TLS-ECDHE-RSA-WITH-AES-256-GCM-SHA384:"
-            "TLS-ECDHE-RSA-WITH-CHACHA20-POLY1305-SHA256:"
-            "TLS-ECDHE-RSA-WITH-AES-128-GCM-SHA256:"
-            "TLS-ECDHE-RSA-WITH-AES-256-CBC-SHA384"
+        # is-active prints one state per unit, in the order given.
+        result = subprocess.run(
+            ["systemctl", "is-active", *self._VPN_SERVICES],
+            capture_output=True,
+            text=True,
         )
+        states = dict(zip(self._VPN_SERVICES, result.stdout.splitlines()))
+        inactive = [unit for unit in self._VPN_SERVICES if states.get(unit) != "active"]
+        if inactive:
+            logger.warning(
+                "⚠️  Warning: OpenVPN services are not active after restore: %s",
+                ", ".join(inactive),
+            )
 
-        return f"""port {{port}}
-proto {{proto}}
-dev tun
-topology subnet
-ca ca.crt
-cert server-cert.crt
-key server-cert.key
-dh none
-ecdh-curve prime256v1
-crl-verify crl.pem
-tls-crypt tls-crypt.key
-server 10.8.0.0 255.255.255.0
-ifconfig-pool-persist {OpenVPNConstants.VAR_RUN_OPENVPN}/ipp.txt
-status /var/log/openvpn/openvpn-status.log
-push "redirect-gateway def1 bypass-dhcp"
-{dns_lines}
-keepalive 10 120
-cipher {self.settings.get("cipher", "AES-256-GCM")}
-ncp-ciphers {cipher_config}
-tls-server
-tls-version-min 1.2
-tls-cipher {cc_cipher_config}
-user nobody
-group nogroup
-persist-key
-persist-tun
-verb 3
-{{extra_auth}}"""
-
-    def _get_login_config(self) -> str:
-        # Generate login-based server configuration
-
-        dns_lines = {
-            "1": "",
-            "2": f'push "dhcp-option DNS 10.9.0.1"',
-            "3": 'push "dhcp-option DNS 1.1.1.1"\npush "dhcp-option DNS 1.0.0.1"',
-            "4": 'push "dhcp-option DNS 8.8.8.8"\npush "dhcp-option DNS 8.8.4.4"',
-            "5": 'push "dhcp-option DNS 94.140.14.14"\npush "dhcp-option DNS 94.140.15.15"',
-        }.get(self.settings.get("dns", "3"), "")
-
-        cipher_config = self.settings.get("cipher", "AES-256-GCM") + ":AES-128-GCM"
-        cc_cipher_config = "TLS-ECDHE-RSA-WITH-AES-256-GCM-SHA384:TLS-ECDHE-RSA-WITH-CHACHA20-POLY1305-SHA256:TLS-ECDHE-RSA-WITH-AES-128-GCM-SHA256:TLS-ECDHE-RSA-WITH-AES-256-CBC-SHA384"
-
-        return f"""port {self.settings["login_port"]}
-proto {self.settings["login_proto"]}
-dev tun1
-topology subnet
-ca ca.crt
-cert server-cert.crt
-key server-cert.key
-dh none
-ecdh-curve prime256v1
-server 10.9.0.0 255.255.255.0
-ifconfig-pool-persist {OpenVPNConstants.VAR_RUN_OPENVPN}/ipp-login.txt
-
-# PAM authentication
-plugin /usr/lib/x86_64-linux-gnu/openvpn/plugins/openvpn-plugin-auth-pam.so openvpn
-username-as-common-name
-verify-client-cert none
+    @staticmethod
+    def _remove_path(path: str) -> None:
+        """Removes a file, symlink or directory tree without a prior existence check."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except IsADirectoryError:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _fix_perms(root: str) -> None:
+        """Sets root ownership and private modes on a tree in a single walk."""
+        for dirpath, _, filenames in os.walk(root):
+            os.chown(dirpath, 0, 0)
+            os.chmod(dirpath, 0o755 if dirpath == root else 0o700)
+            for name in filenames:
+                file_path = os.path.join(dirpath, name)
+                if os.path.islink(file_path):
+                    continue
+                os.chown(file_path, 0, 0)
+                os.chmod(file_path, 0o600)
+
+    def _get_base_config(self, port: Any, proto: str, extra_auth: str = "") -> str:
+        """Renders the certificate-based server config, memoized until settings change."""
+        key = ("base", port, proto, extra_auth)
+        rendered = self._rendered_configs.get(key)
+        if rendered is None:
+            rendered = self._rendered_configs[key] = self._BASE_TEMPLATE.format_map(
+                {
+                    "port": port,
+                    "proto": proto,
+                    "run_dir": OpenVPNConstants.VAR_RUN_OPENVPN,
+                    "ec_curve": self.EC_CURVE,
+                    "dns": self._dns_lines("10.8.0.1"),
+                    "cipher": self.settings.get("cipher", "AES-256-GCM"),
+                    "tls_ciphers": self._TLS_CIPHERS,
+                    "extra_auth": extra_auth,
+                }
+            )
+        return rendered
 
-push "redirect-gateway def1 bypass-dhcp"
-{dns_lines}
-keepalive 10 120
+    def _dns_lines(self, gateway: str) -> str:
+        """Returns the DNS push lines; the local Unbound option points at the subnet gateway."""
+        dns_choice = self.settings.get("dns", "3")
+        if dns_choice == "2":
+            return f'push "dhcp-option DNS {gateway}"'
+        return self._DNS_STATIC_OPTIONS.get(dns_choice, "")
 
-# CRL verification
-crl-verify crl.pem
-tls-crypt tls-crypt.key
-cipher {self.settings.get("cipher", "AES-256-GCM")}
-ncp-ciphers {cipher_config}
-tls-server
-tls-version-min 1.2
-tls-cipher {cc_cipher_config}
-client-config-dir {OpenVPNConstants.CCD_DIR}
-user nobody
-group nogroup
-persist-key
-persist-tun
-status /var/log/openvpn/status-login.log
-verb 3"""
+    def _get_login_config(self) -> str:
+        """Renders the login-based server config, memoized until settings change."""
+        port = self.settings["login_port"]
+        proto = self.settings["login_proto"]
+        key = ("login", port, proto)
+        rendered = self._rendered_configs.get(key)
+        if rendered is None:
+            rendered = self._rendered_configs[key] = self._LOGIN_TEMPLATE.format_map(
+                {
+                    "port": port,
+                    "proto": proto,
+                    "run_dir": OpenVPNConstants.VAR_RUN_OPENVPN,
+                    "ccd_dir": OpenVPNConstants.CCD_DIR,
+                    "ec_curve": self.EC_CURVE,
+                    "dns": self._dns_lines("10.9.0.1"),
+                    "cipher": self.settings.get("cipher", "AES-256-GCM"),
+                    "tls_ciphers": self._TLS_CIPHERS,
+                }
+            )
+        return rendered
 
     def _get_monitoring_config(self, service_type: str = "cert") -> str:
         """Returns the config lines needed for traffic monitoring with UDS."""
-
-        # Use different sockets for different services
-        if service_type == "login":
-            uds_socket = "/run/openvpn-server/ovpn-mgmt-login.sock"
-        else:
-            uds_socket = "/run/openvpn-server/ovpn-mgmt-cert.sock"
-
-        on_connect_script = VPNPaths.get_on_connect_script()
-        on_disconnect_script = VPNPaths.get_on_disconnect_script()
-
-        return f"""
-# --- Traffic Monitoring Config ---
-script-security 2
-client-connect {on_connect_script}
-client-disconnect {on_disconnect_script}
-management {uds_socket} unix
-"""
+        key = ("monitoring", service_type)
+        rendered = self._rendered_configs.get(key)
+        if rendered is None:
+            rendered = self._rendered_configs[key] = self._MONITORING_TEMPLATE.format(
+                on_connect=VPNPaths.get_on_connect_script(),
+                on_disconnect=VPNPaths.get_on_disconnect_script(),
+                # Use different sockets for different services
+                uds_socket=(
+                    "/run/openvpn-server/ovpn-mgmt-login.sock"
+                    if service_type == "login"
+                    else "/run/openvpn-server/ovpn-mgmt-cert.sock"
+                ),
+            )
+        return rendered
 
     def _get_primary_interface(self) -> str:
-        # This method remains unchanged
+        """Returns the interface of the lowest-metric default route, resolved once per instance."""
+        if self._primary_interface is None:
+            self._primary_interface = self._find_default_route_interface()
+        return self._primary_interface
+
+    def _find_default_route_interface(self) -> str:
+        """Parses the kernel routing table, falling back to eth0."""
+        best: Optional[Tuple[int, str]] = None
         try:
-            result = subprocess.run(
-                "ip route get 8.8.8.8 | awk '{print $5; exit}'",
-                shell=True,
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            return result.stdout.strip()
-        except Exception:
-            return "eth0"
+            with open(self._PROC_ROUTE, "r") as f:
+                next(f, None)
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 7 or fields[1] != "00000000":
+                        continue
+                    if not int(fields[3], 16) & self._RTF_UP:
+                        continue
+                    metric = int(fields[6])
+                    if best is None or metric < best[0]:
+                        best = (metric, fields[0])
+        except (OSError, ValueError):
+            pass
+        return best[1] if best else "eth0"
 
     def _read_file(self, path: str) -> str:
-        # This method remains unchanged
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                return f.read().strip()
-        return ""
+        """Returns the stripped contents of a PEM/key file, or an empty string if missing."""
+        try:
+            with open(path, "rb") as f:
+                return f.read().strip().decode()
+        except FileNotFoundError:
+            return ""
 
     def _extract_certificate(self, path: str) -> str:
-        # This method remains unchanged
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                content = f.read()
-                lines = content.split("\n")
-                cert_lines = []
-                in_cert = False
-                for line in lines:
-                    if "-----BEGIN CERTIFICATE-----" in line:
-                        in_cert = True
-                        cert_lines.append(line)
-                    elif "-----END CERTIFICATE-----" in line:
-                        cert_lines.append(line)
-                        break
-                    elif in_cert:
-                        cert_lines.append(line)
-                return "\n".join(cert_lines)
-        return ""
\ No newline at end of file
+        """Returns the PEM certificate block of an Easy-RSA issued certificate file."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return ""
+        begin = data.find(b"-----BEGIN CERTIFICATE-----")
+        if begin == -1:
+            return ""
+        start = data.rfind(b"\n", 0, begin) + 1
+        end = data.find(b"-----END CERTIFICATE-----", begin)
+        stop = len(data) if end == -1 else data.find(b"\n", end)
+        if stop == -1:
+            stop = len(data)
+        return data[start:stop].decode("ascii")
@@ -8,7 +8,7 @@ from core.login_user_manager import LoginUserManager
 from data.db import DATABASE_FILE
 from core.backup_interface import IBackupable
 from core.types import Username, Password, ConfigData, UserData
-from config.shared_config import CLIENT_TEMPLATE, USER_CERTS_TEMPLATE
+from config.shared_config import CLIENT_TEMPLATE
 from core.exceptions import (
     UserAlreadyExistsError,
     UserNotFoundError,
@@ -25,27 +25,30 @@ class UserService(IBackupable):
         self.openvpn_manager = openvpn_manager
         self.login_manager = login_manager
 
-    def _generate_user_certificate_config(self, username: Username) -> Optional[str]:
-        """Generates the OpenVPN client configuration for a user based on their certificate."""
-        user_data = self.user_repo.get_user_by_username(username, 'certificate')
-        if not user_data or not user_data.get('cert_pem'):
-            return None
-
-        ca_cert = self.openvpn_manager._read_file("/etc/openvpn/ca.crt")
-        tls_crypt_key = self.openvpn_manager._read_file("/etc/openvpn/tls-crypt.key")
-        
-        user_specific_certs = USER_CERTS_TEMPLATE.format(
-            user_cert=user_data['cert_pem'],
-            user_key=user_data['key_pem']
-        )
-        
-        return CLIENT_TEMPLATE.format(
+    def _generate_user_certificate_config(
+        self,
+        username: Username,
+        cert_pem: Optional[str] = None,
+        key_pem: Optional[str] = None,
+    ) -> Optional[str]:
+        """Generates the OpenVPN client configuration for a user based on their certificate.
+
+        Callers that already hold the certificate and key (e.g. right after
+        issuing them) can pass them in to skip the database lookup.
+        """
+        if cert_pem is None or key_pem is None:
+            user_data = self.user_repo.get_user_by_username(username, 'certificate')
+            if not user_data or not user_data.get('cert_pem'):
+                return None
+            cert_pem, key_pem = user_data['cert_pem'], user_data['key_pem']
+
+        return self.openvpn_manager._render_client_config(
+            CLIENT_TEMPLATE,
+            cert_pem,
+            key_pem,
             proto=self.openvpn_manager.settings.get("cert_proto", "udp"),
             server_ip=self.openvpn_manager.settings.get("public_ip"),
-            port=self.openvpn_manager.settings.get("cert_port", "1194"),
-            ca_cert=ca_cert,
-            user_specific_certs=user_specific_certs,
-            tls_crypt_key=tls_crypt_key
+            port=self.openvpn_manager.settings.get("cert_port", "1194")
         )
 
     def create_user(self, username: Username, password: Optional[Password] = None) -> Optional[ConfigData]:
@@ -78,7 +81,9 @@ class UserService(IBackupable):
             self.login_manager.add_user(username, password)
             self.user_repo.add_user_protocol(user_id, "openvpn", "login")
 
-        client_config = self._generate_user_certificate_config(username)
+        client_config = self._generate_user_certificate_config(
+            username, cert_content, key_content
+        )
 
         logger.info("✅ User '%s' created successfully", username)
         return client_config
@@ -0,0 +1,631 @@
+import logging
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.openvpn_manager import OpenVPNManager
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_fix_perms_sets_modes_in_single_walk(tmp_path, monkeypatch):
+    chowned = []
+    monkeypatch.setattr(os, "chown", lambda path, uid, gid: chowned.append(path))
+
+    root = tmp_path / "pki"
+    (root / "private").mkdir(parents=True)
+    (root / "ca.crt").write_text("ca")
+    (root / "private" / "ca.key").write_text("key")
+
+    OpenVPNManager._fix_perms(str(root))
+
+    assert _mode(root) == 0o755
+    assert _mode(root / "private") == 0o700
+    assert _mode(root / "ca.crt") == 0o600
+    assert _mode(root / "private" / "ca.key") == 0o600
+    assert len(chowned) == 4
+
+
+def test_settings_are_loaded_lazily(tmp_path, monkeypatch):
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text('{"cert_port": "1194"}')
+    monkeypatch.setattr(OpenVPNManager, "SETTINGS_FILE", str(settings_file))
+
+    manager = OpenVPNManager()
+    assert manager._settings is None
+    assert manager.settings["cert_port"] == "1194"
+
+
+def test_atomic_write_bytes_replaces_file(tmp_path):
+    from core.openvpn_manager import _atomic_write_bytes
+
+    target = tmp_path / "openvpn"
+    target.write_text("old")
+
+    _atomic_write_bytes(str(target), b"new\n", 0o600)
+
+    assert target.read_bytes() == b"new\n"
+    assert _mode(target) == 0o600
+    assert not (tmp_path / "openvpn.tmp").exists()
+
+
+def test_atomic_write_bytes_removes_tmp_on_failure(tmp_path, monkeypatch):
+    from core.openvpn_manager import _atomic_write_bytes
+
+    def failing_replace(src, dst):
+        raise OSError("replace failed")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+
+    with pytest.raises(OSError):
+        _atomic_write_bytes(str(tmp_path / "openvpn"), b"new\n")
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_extract_certificate_returns_pem_block(tmp_path):
+    cert_file = tmp_path / "alice.crt"
+    cert_file.write_text(
+        "Certificate:\n    Data: ...\n"
+        "-----BEGIN CERTIFICATE-----\nMIIB\nAbCd\n-----END CERTIFICATE-----\n"
+    )
+
+    pem = OpenVPNManager()._extract_certificate(str(cert_file))
+
+    assert pem == "-----BEGIN CERTIFICATE-----\nMIIB\nAbCd\n-----END CERTIFICATE-----"
+    assert OpenVPNManager()._extract_certificate(str(tmp_path / "missing.crt")) == ""
+
+
+def test_base_config_renders_template():
+    manager = OpenVPNManager()
+    manager.settings = {"dns": "4", "cipher": "AES-128-GCM"}
+
+    rendered = manager._get_base_config(port=1194, proto="udp")
+
+    assert rendered.startswith("port 1194\nproto udp\n")
+    assert 'push "dhcp-option DNS 8.8.8.8"' in rendered
+    assert "ncp-ciphers AES-128-GCM:AES-128-GCM" in rendered
+    assert "{" not in rendered
+
+
+def test_nat_rules_cover_both_subnets():
+    rules = OpenVPNManager()._nat_rules("ens3")
+
+    assert rules == [
+        ["-s", "10.8.0.0/24", "-o", "ens3", "-j", "MASQUERADE"],
+        ["-s", "10.9.0.0/24", "-o", "ens3", "-j", "MASQUERADE"],
+    ]
+
+
+def test_systemctl_batches_units_and_falls_back_per_unit(monkeypatch):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 1 if len(calls) == 1 else 0)
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+
+    OpenVPNManager._systemctl(["disable", "--now"], ["a", "b"], check=False)
+
+    assert calls == [
+        ["systemctl", "disable", "--now", "a", "b"],
+        ["systemctl", "disable", "--now", "a"],
+        ["systemctl", "disable", "--now", "b"],
+    ]
+
+
+def test_base_config_cache_is_reset_when_settings_change():
+    manager = OpenVPNManager()
+    manager.settings = {"dns": "3"}
+    first = manager._get_base_config(port=1194, proto="udp")
+    assert manager._get_base_config(port=1194, proto="udp") is first
+
+    manager.settings = {"dns": "1"}
+    assert "1.1.1.1" not in manager._get_base_config(port=1194, proto="udp")
+
+
+def test_primary_interface_uses_lowest_metric_default_route(tmp_path, monkeypatch):
+    route_file = tmp_path / "route"
+    route_file.write_text(
+        "Iface\tDestination\tGateway\tFlags\tRefCnt\tUse\tMetric\tMask\n"
+        "wlan0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\n"
+        "ens3\t00000000\t0100000A\t0003\t0\t0\t100\t00000000\n"
+        "ens3\t0000000A\t00000000\t0001\t0\t0\t100\t00FFFFFF\n"
+    )
+    monkeypatch.setattr(OpenVPNManager, "_PROC_ROUTE", str(route_file))
+    assert OpenVPNManager()._get_primary_interface() == "ens3"
+
+    monkeypatch.setattr(OpenVPNManager, "_PROC_ROUTE", str(tmp_path / "missing"))
+    assert OpenVPNManager()._get_primary_interface() == "eth0"
+
+
+def test_remove_path_handles_files_dirs_links_and_missing(tmp_path):
+    tree = tmp_path / "tree"
+    (tree / "sub").mkdir(parents=True)
+    (tree / "sub" / "file").write_text("x")
+    single = tmp_path / "single"
+    single.write_text("x")
+    link = tmp_path / "link"
+    link.symlink_to(tree)
+
+    for path in (link, tree, single, tmp_path / "missing"):
+        OpenVPNManager._remove_path(str(path))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_save_settings_round_trips(tmp_path, monkeypatch):
+    settings_file = tmp_path / "settings.json"
+    monkeypatch.setattr(OpenVPNManager, "OPENVPN_DIR", str(tmp_path))
+    monkeypatch.setattr(OpenVPNManager, "SETTINGS_FILE", str(settings_file))
+
+    manager = OpenVPNManager()
+    manager.settings = {"public_ip": "1.2.3.4", "cert_port": "1194"}
+    manager._save_settings()
+
+    assert _mode(settings_file) == 0o600
+    assert OpenVPNManager().settings == {"public_ip": "1.2.3.4", "cert_port": "1194"}
+
+
+def test_create_user_certificates_builds_serially_in_one_shell(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        subprocess, "run", lambda cmd, **kwargs: calls.append(cmd)
+    )
+
+    OpenVPNManager().create_user_certificates(["alice", "bob"])
+
+    assert len(calls) == 1
+    assert calls[0][0] == "bash"
+    assert "build-client-full" in calls[0][2]
+    assert calls[0][-2:] == ["alice", "bob"]
+
+
+def test_create_user_certificates_single_user_builds_in_one_call(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        subprocess, "run", lambda cmd, **kwargs: calls.append(cmd)
+    )
+
+    OpenVPNManager().create_user_certificates(["alice"])
+
+    assert calls == [["./easyrsa", "--batch", "build-client-full", "alice", "nopass"]]
+
+
+def test_setup_unbound_writes_tuned_config(tmp_path, monkeypatch):
+    unbound_config = tmp_path / "unbound.conf.d" / "openvpn.conf"
+    calls = []
+    monkeypatch.setattr(OpenVPNManager, "UNBOUND_CONFIG", str(unbound_config))
+    monkeypatch.setattr(os, "cpu_count", lambda: 3)
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+
+    manager = OpenVPNManager()
+    manager.settings = {"dns": "2"}
+    manager._setup_unbound()
+
+    content = unbound_config.read_text()
+    assert "num-threads: 3" in content
+    assert "rrset-cache-slabs: 4" in content
+    assert "prefetch: yes" in content
+    assert "    interface: 10.8.0.1\n" in content
+    assert "    access-control: 10.9.0.0/24 allow\n" in content
+    assert calls[0] == ["unbound-checkconf"]
+
+
+def test_link_or_copy_hardlinks_over_existing_file(tmp_path):
+    src = tmp_path / "ca.crt"
+    src.write_text("new")
+    dst = tmp_path / "installed.crt"
+    dst.write_text("old")
+
+    OpenVPNManager._link_or_copy(str(src), str(dst))
+
+    assert dst.read_text() == "new"
+    assert os.stat(dst).st_ino == os.stat(src).st_ino
+
+
+def test_link_or_copy_cleans_up_after_failed_replace(tmp_path, monkeypatch):
+    src = tmp_path / "ca.crt"
+    src.write_text("cert")
+    dst = tmp_path / "installed.crt"
+    os.link(src, dst)
+
+    def failing_replace(src_path, dst_path):
+        raise OSError("replace failed")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+
+    OpenVPNManager._link_or_copy(str(src), str(dst))
+
+    assert sorted(os.listdir(tmp_path)) == ["ca.crt", "installed.crt"]
+    assert dst.read_text() == "cert"
+
+
+def test_missing_packages_filters_installed(monkeypatch):
+    output = (
+        "openvpn install ok installed\n"
+        "curl deinstall ok config-files\n"
+    )
+    monkeypatch.setattr(
+        subprocess,
+        "run",
+        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 1, stdout=output),
+    )
+
+    missing = OpenVPNManager._missing_packages(["openvpn", "curl", "unbound"])
+
+    assert missing == ["curl", "unbound"]
+
+
+def test_firewall_rules_only_restore_missing_rules(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append((cmd, kwargs.get("input")))
+        stdout = "*nat\n-A POSTROUTING -s 10.8.0.0/24 -o ens3 -j MASQUERADE\nCOMMIT\n"
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout)
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setattr(OpenVPNManager, "FIREWALL_RULES_V4", str(tmp_path / "rules.v4"))
+    monkeypatch.setattr(OpenVPNManager, "_get_primary_interface", lambda self: "ens3")
+
+    OpenVPNManager()._setup_firewall_rules()
+
+    assert [cmd[0] for cmd, _ in calls] == ["iptables-save", "iptables-restore", "iptables-save"]
+    assert sorted(os.listdir(tmp_path)) == ["rules.v4"]
+    assert calls[1][1] == (
+        "*nat\n-A POSTROUTING -s 10.9.0.0/24 -o ens3 -j MASQUERADE\nCOMMIT\n"
+    )
+
+
+def test_firewall_rules_save_failure_removes_tmp_file(tmp_path, monkeypatch):
+    def fake_run(cmd, **kwargs):
+        if cmd == ["iptables-save"]:
+            raise subprocess.CalledProcessError(1, cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout="")
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setattr(OpenVPNManager, "FIREWALL_RULES_V4", str(tmp_path / "rules.v4"))
+    monkeypatch.setattr(OpenVPNManager, "_get_primary_interface", lambda self: "ens3")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        OpenVPNManager()._setup_firewall_rules()
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_revoke_restarts_services_in_one_call(tmp_path, monkeypatch):
+    pki = tmp_path / "pki"
+    (pki / "issued").mkdir(parents=True)
+    (pki / "issued" / "bob.crt").write_text("cert")
+    (pki / "crl.pem").write_text("crl")
+    out = tmp_path / "out"
+    out.mkdir()
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setattr(OpenVPNManager, "PKI_DIR", str(pki))
+    monkeypatch.setattr(OpenVPNManager, "OPENVPN_DIR", str(out))
+    server_dir = tmp_path / "server"
+    server_dir.mkdir()
+    monkeypatch.setattr(OpenVPNManager, "_CRL_TARGET_DIRS", (str(server_dir),))
+
+    OpenVPNManager().revoke_user_certificate("bob")
+
+    systemctl_calls = [cmd for cmd in calls if cmd[0] == "systemctl"]
+    assert systemctl_calls == [["systemctl", "restart", *OpenVPNManager._VPN_SERVICES]]
+    assert (out / "crl.pem").read_text() == "crl"
+    assert (server_dir / "crl.pem").read_text() == "crl"
+    assert _mode(server_dir / "crl.pem") == 0o644
+
+
+def test_server_keys_reread_only_when_changed(tmp_path, monkeypatch):
+    ca = tmp_path / "ca.crt"
+    tls = tmp_path / "tls-crypt.key"
+    ca.write_text("ca-1\n")
+    tls.write_text("tls-1\n")
+    monkeypatch.setattr(OpenVPNManager, "_SERVER_KEY_FILES", (str(ca), str(tls)))
+    manager = OpenVPNManager()
+    reads = []
+    original_read = manager._read_file
+    monkeypatch.setattr(manager, "_read_file", lambda path: reads.append(path) or original_read(path))
+
+    assert manager._get_server_keys() == ("ca-1", "tls-1")
+    assert manager._get_server_keys() == ("ca-1", "tls-1")
+    assert len(reads) == 2
+
+    ca.write_text("ca-2\n")
+    os.utime(ca, ns=(0, os.stat(ca).st_mtime_ns + 1_000_000))
+    assert manager._get_server_keys() == ("ca-2", "tls-1")
+
+
+def test_enable_ip_forwarding_writes_drop_in_once(tmp_path, monkeypatch):
+    drop_in = tmp_path / "99-openvpn.conf"
+    proc_forward = tmp_path / "ip_forward"
+    monkeypatch.setattr(OpenVPNManager, "SYSCTL_CONFIG", str(drop_in))
+    monkeypatch.setattr(OpenVPNManager, "_PROC_IP_FORWARD", str(proc_forward))
+
+    OpenVPNManager()._enable_ip_forwarding()
+    assert drop_in.read_text() == "net.ipv4.ip_forward=1\n"
+    assert proc_forward.read_text() == "1\n"
+
+    inode = os.stat(drop_in).st_ino
+    os.utime(proc_forward, ns=(0, 0))
+    OpenVPNManager()._enable_ip_forwarding()
+    assert os.stat(drop_in).st_ino == inode
+    assert os.stat(proc_forward).st_mtime_ns == 0
+
+
+def test_enable_ip_forwarding_keeps_existing_drop_in_lines(tmp_path, monkeypatch):
+    drop_in = tmp_path / "99-openvpn.conf"
+    drop_in.write_text("net.ipv6.conf.all.forwarding=1")
+    monkeypatch.setattr(OpenVPNManager, "SYSCTL_CONFIG", str(drop_in))
+    monkeypatch.setattr(OpenVPNManager, "_PROC_IP_FORWARD", str(tmp_path / "ip_forward"))
+
+    OpenVPNManager()._enable_ip_forwarding()
+
+    assert drop_in.read_text() == (
+        "net.ipv6.conf.all.forwarding=1\nnet.ipv4.ip_forward=1\n"
+    )
+
+
+def test_ensure_dir_creates_each_directory_once(tmp_path, monkeypatch):
+    created = []
+    real_makedirs = os.makedirs
+    monkeypatch.setattr(
+        os, "makedirs", lambda path, **kwargs: created.append(path) or real_makedirs(path, **kwargs)
+    )
+    manager = OpenVPNManager()
+    target = str(tmp_path / "a")
+
+    manager._ensure_dir(target)
+    manager._ensure_dir(target)
+
+    assert os.path.isdir(target)
+    assert created == [target]
+
+
+def test_save_settings_skips_unchanged_payload(tmp_path, monkeypatch):
+    settings_file = tmp_path / "settings.json"
+    monkeypatch.setattr(OpenVPNManager, "OPENVPN_DIR", str(tmp_path))
+    monkeypatch.setattr(OpenVPNManager, "SETTINGS_FILE", str(settings_file))
+    manager = OpenVPNManager()
+    manager.settings = {"cert_port": "1194"}
+    manager._save_settings()
+    inode = os.stat(settings_file).st_ino
+
+    reloaded = OpenVPNManager()
+    reloaded.settings
+    reloaded._save_settings()
+    assert os.stat(settings_file).st_ino == inode
+
+    reloaded.settings["cert_port"] = "443"
+    reloaded._save_settings()
+    assert os.stat(settings_file).st_ino != inode
+
+
+def test_generate_user_configs_maps_each_user(tmp_path, monkeypatch):
+    pki = tmp_path / "pki"
+    for name in ("issued", "private"):
+        (pki / name).mkdir(parents=True)
+    for user in ("alice", "bob"):
+        (pki / "issued" / f"{user}.crt").write_text(
+            f"-----BEGIN CERTIFICATE-----\n{user}\n-----END CERTIFICATE-----\n"
+        )
+        (pki / "private" / f"{user}.key").write_text(f"{user}-key\n")
+    monkeypatch.setattr(OpenVPNManager, "PKI_DIR", str(pki))
+    monkeypatch.setattr(
+        OpenVPNManager, "_get_server_keys", lambda self: ("ca", "tls")
+    )
+    manager = OpenVPNManager()
+    manager.settings = {"public_ip": "1.2.3.4", "cert_port": "1194", "cert_proto": "udp"}
+
+    configs = manager.generate_user_configs(["alice", "bob"])
+
+    assert list(configs) == ["alice", "bob"]
+    assert configs["bob"] == manager.generate_user_config("bob")
+    assert "bob-key" in configs["bob"] and "alice" not in configs["bob"]
+
+
+def test_apt_lists_fresh_uses_newest_stamp(tmp_path, monkeypatch):
+    stale = tmp_path / "update-success-stamp"
+    fresh = tmp_path / "lists"
+    stale.write_text("")
+    fresh.mkdir()
+    old = os.stat(stale).st_mtime - 2 * OpenVPNManager._APT_MAX_AGE
+    os.utime(stale, (old, old))
+
+    monkeypatch.setattr(OpenVPNManager, "_APT_UPDATE_STAMPS", (str(stale),))
+    assert not OpenVPNManager._apt_lists_fresh()
+
+    monkeypatch.setattr(
+        OpenVPNManager, "_APT_UPDATE_STAMPS", (str(stale), str(fresh), str(tmp_path / "missing"))
+    )
+    assert OpenVPNManager._apt_lists_fresh()
+
+    monkeypatch.setattr(OpenVPNManager, "_APT_UPDATE_STAMPS", (str(tmp_path / "missing"),))
+    assert not OpenVPNManager._apt_lists_fresh()
+
+
+def test_shared_config_memoized_until_main_cert_changes(tmp_path, monkeypatch):
+    pki = tmp_path / "pki"
+    for name in ("issued", "private"):
+        (pki / name).mkdir(parents=True)
+    main_crt = pki / "issued" / "main.crt"
+    main_crt.write_text("-----BEGIN CERTIFICATE-----\nv1\n-----END CERTIFICATE-----\n")
+    (pki / "private" / "main.key").write_text("main-key\n")
+    monkeypatch.setattr(OpenVPNManager, "PKI_DIR", str(pki))
+    monkeypatch.setattr(OpenVPNManager, "_get_server_keys", lambda self: ("ca", "tls"))
+    manager = OpenVPNManager()
+    manager.settings = {"public_ip": "1.2.3.4"}
+    reads = []
+    original_extract = manager._extract_certificate
+    monkeypatch.setattr(
+        manager, "_extract_certificate", lambda path: reads.append(path) or original_extract(path)
+    )
+
+    first = manager.get_shared_config()
+    assert manager.get_shared_config() is first
+    assert len(reads) == 1
+
+    main_crt.write_text("-----BEGIN CERTIFICATE-----\nv2\n-----END CERTIFICATE-----\n")
+    os.utime(main_crt, ns=(0, os.stat(main_crt).st_mtime_ns + 1_000_000))
+    assert "v2" in manager.get_shared_config()
+
+
+def test_settings_parsed_once_across_instances(tmp_path, monkeypatch):
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text('{"cert_port": "1194"}')
+    monkeypatch.setattr(OpenVPNManager, "SETTINGS_FILE", str(settings_file))
+    opened = []
+    real_open = open
+    monkeypatch.setattr(
+        "builtins.open",
+        lambda path, *args, **kwargs: opened.append(path) or real_open(path, *args, **kwargs),
+    )
+
+    first = OpenVPNManager().settings
+    first["cert_port"] = "mutated"
+    second = OpenVPNManager().settings
+
+    assert second == {"cert_port": "1194"}
+    assert opened.count(str(settings_file)) == 1
+
+
+def test_setup_pki_generates_tls_key_alongside_easyrsa(tmp_path, monkeypatch):
+    source = tmp_path / "easy-rsa-src"
+    source.mkdir()
+    (source / "easyrsa").write_text("#!/bin/sh\n")
+    (source / "x509-types").mkdir()
+    (source / "x509-types" / "client").write_text("basicConstraints = CA:FALSE\n")
+    events = []
+
+    class FakePopen:
+        def __init__(self, cmd, **kwargs):
+            events.append(("start", cmd[0]))
+            self.returncode = 1
+
+        def communicate(self):
+            events.append(("wait", "openvpn"))
+            return b"", b"genkey failed"
+
+    def fake_run(cmd, **kwargs):
+        events.append(("run", cmd[0]))
+        return subprocess.CompletedProcess(cmd, 0)
+
+    monkeypatch.setattr(subprocess, "Popen", FakePopen)
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setattr(OpenVPNManager, "EASYRSA_SOURCE_DIR", str(source))
+    monkeypatch.setattr(OpenVPNManager, "EASYRSA_DIR", str(tmp_path / "easy-rsa"))
+
+    with pytest.raises(subprocess.CalledProcessError) as exc_info:
+        OpenVPNManager()._setup_pki()
+    assert exc_info.value.stderr == b"genkey failed"
+    assert events == [("start", "openvpn"), ("run", "bash"), ("wait", "openvpn")]
+    assert not os.path.islink(tmp_path / "easy-rsa" / "x509-types")
+    assert os.stat(tmp_path / "easy-rsa" / "easyrsa").st_ino != os.stat(source / "easyrsa").st_ino
+
+
+def test_revoke_user_certificates_regenerates_crl_once(tmp_path, monkeypatch):
+    pki = tmp_path / "pki"
+    (pki / "issued").mkdir(parents=True)
+    for user in ("alice", "bob"):
+        (pki / "issued" / f"{user}.crt").write_text("cert")
+    (pki / "crl.pem").write_text("crl")
+    out = tmp_path / "out"
+    out.mkdir()
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setattr(OpenVPNManager, "PKI_DIR", str(pki))
+    monkeypatch.setattr(OpenVPNManager, "OPENVPN_DIR", str(out))
+    monkeypatch.setattr(OpenVPNManager, "_CRL_TARGET_DIRS", ())
+
+    OpenVPNManager().revoke_user_certificates(["alice", "ghost", "bob"])
+
+    assert calls[0][0] == "bash" and calls[0][-2:] == ["alice", "bob"]
+    assert calls[1:] == [
+        ["./easyrsa", "gen-crl"],
+        ["systemctl", "restart", *OpenVPNManager._VPN_SERVICES],
+    ]
+
+
+def test_uninstall_waits_for_package_purge(monkeypatch, caplog):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        returncode = 100 if cmd[:2] == ["apt-get", "autoremove"] else 0
+        return subprocess.CompletedProcess(cmd, returncode, stderr="dpkg lock held\n")
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    monkeypatch.setattr(OpenVPNManager, "_remove_path", staticmethod(lambda path: None))
+    monkeypatch.setattr(OpenVPNManager, "_get_primary_interface", lambda self: "eth0")
+
+    with caplog.at_level(logging.INFO), pytest.raises(subprocess.CalledProcessError):
+        OpenVPNManager().uninstall_openvpn()
+
+    assert calls[-1][:3] == ["apt-get", "autoremove", "--purge"]
+    assert "exit status 100" in caplog.text
+    assert "uninstallation finished" not in caplog.text
+
+
+def test_post_restore_warns_about_each_inactive_unit(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(OpenVPNManager, "PKI_DIR", str(tmp_path / "pki"))
+    monkeypatch.setattr(OpenVPNManager, "SETTINGS_FILE", str(tmp_path / "settings.json"))
+
+    def fake_run(cmd, **kwargs):
+        stdout = "active\nfailed\n" if cmd[:2] == ["systemctl", "is-active"] else ""
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout)
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+
+    with caplog.at_level(logging.WARNING):
+        OpenVPNManager().post_restore()
+
+    assert "openvpn-server@server-login" in caplog.text
+    assert "openvpn-server@server-cert" not in caplog.text
+
+
+def test_install_stops_before_system_changes_when_pki_fails(monkeypatch):
+    steps = []
+
+    def failing_pki(self):
+        raise subprocess.CalledProcessError(1, ["bash"])
+
+    monkeypatch.setattr(OpenVPNManager, "_install_prerequisites", lambda self: None)
+    monkeypatch.setattr(OpenVPNManager, "_setup_pki", failing_pki)
+    for name in (
+        "_generate_server_configs",
+        "_setup_firewall_rules",
+        "_enable_ip_forwarding",
+        "_setup_pam",
+        "_start_openvpn_services",
+    ):
+        monkeypatch.setattr(OpenVPNManager, name, lambda self, name=name: steps.append(name))
+
+    with pytest.raises(subprocess.CalledProcessError):
+        OpenVPNManager().install_openvpn({"dns": "1"})
+
+    assert steps == ["_generate_server_configs"]
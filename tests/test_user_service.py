@@ -33,4 +33,14 @@ def test_remove_user_calls_managers():
     service.remove_user("bob")
     openvpn_manager.revoke_user_certificate.assert_called_once_with("bob")
     login_manager.remove_user.assert_called_once_with("bob")
-    user_repo.remove_user.assert_called_once_with("bob")
\ No newline at end of file
+    user_repo.remove_user.assert_called_once_with("bob")
+
+
+def test_certificate_config_uses_supplied_pem_without_lookup():
+    service, user_repo, openvpn_manager, login_manager = _create_service()
+    openvpn_manager.settings = {"public_ip": "1.2.3.4"}
+    openvpn_manager._render_client_config.return_value = "config"
+
+    assert service._generate_user_certificate_config("alice", "cert", "key") == "config"
+    user_repo.get_user_by_username.assert_not_called()
+    assert openvpn_manager._render_client_config.call_args[0][1:] == ("cert", "key")